@@ -121,6 +121,36 @@ class MpdDevice:
         curren_playlist = self._client.playlist()
         print(curren_playlist)
 
+    def snapshot(self):
+        """Fetch status and current song in a single command list.
+
+        Returns a dict with the state, media title and volume level.
+        """
+        import mpd
+
+        try:
+            if not self._is_connected:
+                self._connect()
+
+            self._client.command_list_ok_begin()
+            self._client.status()
+            self._client.currentsong()
+            self._status, self._currentsong = self._client.command_list_end()
+
+            self._update_playlists()
+        except (mpd.ConnectionError, OSError, BrokenPipeError, ValueError):
+            # Cleanly disconnect in case connection is not in valid state
+            self._disconnect()
+
+        if self._status is None:
+            return {'state': STATE_OFF, 'media_title': None, 'volume_level': None}
+
+        return {
+            'state': self.state,
+            'media_title': self.media_title,
+            'volume_level': self.volume_level,
+        }
+
     @property
     def name(self):
         """Return the name of the device."""
@@ -1,9 +1,14 @@
 import sys
+import asyncio
 import mainwindow
+import qasync
 from PySide2.QtWidgets import QApplication
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
+    loop = qasync.QEventLoop(app)
+    asyncio.set_event_loop(loop)
     window = mainwindow.MainWindow()
     window.show()
-    sys.exit(app.exec_())
+    with loop:
+        sys.exit(loop.run_forever())
@@ -1,5 +1,7 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from PySide2.QtWidgets import QMainWindow
-from PySide2.QtCore import QTimer
 from PySide2 import QtGui
 import volume_slider
 import const
@@ -7,19 +9,32 @@ import const
 from ui_mainwindow import Ui_MainWindow
 from MPD import setup_platform
 
+_LOGGER = logging.getLogger(__name__)
+
+UPDATE_INTERVAL = 10
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super(MainWindow, self).__init__()
 
         self.MPD = setup_platform()
+        # MPDClient is not thread safe, so every call made once the window
+        # is running goes through this single worker thread.
+        self._mpd_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mpd")
+        self._tasks = set()
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
-        self.timer = QTimer(self)
+        self._play_icon = QtGui.QIcon(QtGui.QPixmap("resources/play.png"))
+        self._pause_icon = QtGui.QIcon(QtGui.QPixmap("resources/pause.png"))
+        self._last_title = None
+        self._last_vol = -1
+        self._current_playlist_name = None
+        self._current_songs = []
         self.volume_slider = volume_slider.VolumeWidget()
         self.ui.gridLayout_3.addWidget(self.volume_slider, 0, 6)
 
-        self.update()
+        self._refresh_ui(self.MPD.snapshot())
         self.ui.playlist_widget.addItems(self.MPD.source_list)
 
         self.ui.playlist_widget.currentItemChanged.connect(self.select_playlist)
@@ -28,58 +43,141 @@ class MainWindow(QMainWindow):
         self.ui.play_pause_btn.pressed.connect(self.play_pause)
 
         self.ui.previous_btn.pressed.connect(
-            lambda: self.MPD.media_previous_track()
+            lambda: self._spawn(self._run_mpd(self.MPD.media_previous_track))
         )
         self.ui.next_btn.pressed.connect(
-            lambda: self.MPD.media_next_track()
+            lambda: self._spawn(self._run_mpd(self.MPD.media_next_track))
         )
         self.ui.mute_button.pressed.connect(self.toggle_mute)
 
-        self.timer.timeout.connect(self.update)
-        self.timer.start(10000)
+        self._update_task = asyncio.ensure_future(self._update_loop())
 
-    def toggle_mute(self):
-        self.MPD.mute_volume(not self.MPD.is_volume_muted)
-        self.volume_slider.setValue(self.MPD.volume_level * 100)
+    def _run_mpd(self, func, *args):
+        """Run a blocking MPD call on the thread that owns the client."""
+        return asyncio.get_event_loop().run_in_executor(self._mpd_executor, func, *args)
+
+    def _spawn(self, awaitable):
+        """Run an awaitable in the background and log it if it fails."""
+        task = asyncio.ensure_future(awaitable)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
 
-    def update(self):
-        self.MPD.update()
-        state = self.MPD.state
-        media_title = self.MPD.media_title if self.MPD.media_title else "Now playing."
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            _LOGGER.error("MPD call failed: %s", task.exception())
 
-        self.ui.now_playing_label.setText(media_title)
-        self.volume_slider.setValue(self.MPD.volume_level * 100)
+    def closeEvent(self, event):
+        """Stop the background work before the event loop is closed."""
+        self._update_task.cancel()
+        for task in self._tasks:
+            task.cancel()
+        self._mpd_executor.shutdown(wait=False)
+        super(MainWindow, self).closeEvent(event)
+
+    def toggle_mute(self):
+        self._spawn(self._toggle_mute())
+
+    async def _toggle_mute(self):
+        await self._run_mpd(self.MPD.mute_volume, not self.MPD.is_volume_muted)
+        self._set_volume(self.MPD.volume_level)
+
+    async def _update_loop(self):
+        while True:
+            await asyncio.sleep(UPDATE_INTERVAL)
+            try:
+                snap = await self._run_mpd(self.MPD.snapshot)
+            except Exception as exc:  # pylint: disable=broad-except
+                # Keep refreshing; the next snapshot reconnects if needed.
+                _LOGGER.error("Refreshing MPD state failed: %s", exc)
+                continue
+            self._refresh_ui(snap)
+
+    def _refresh_ui(self, snap):
+        media_title = snap['media_title'] if snap['media_title'] else "Now playing."
+
+        if media_title != self._last_title:
+            self._last_title = media_title
+            self.ui.now_playing_label.setText(media_title)
+        self._set_volume(snap['volume_level'])
+
+    def _set_volume(self, volume_level):
+        if volume_level is None:
+            return
+        vol = int(volume_level * 100)
+        if vol == self._last_vol:
+            return
+        self._last_vol = vol
+        # Programmatic refreshes must not be written back to MPD.
+        self.volume_slider.blockSignals(True)
+        self.volume_slider.setValue(vol)
+        self.volume_slider.blockSignals(False)
 
     def play_pause(self):
+        self._spawn(self._play_pause())
+
+    async def _play_pause(self):
         if self.MPD.state == const.STATE_PLAYING:
-            self.MPD.media_pause()
-            icon = "resources/play.png"
+            await self._run_mpd(self.MPD.media_pause)
+            icon = self._play_icon
         elif self.MPD.state == const.STATE_PAUSED:
-            self.MPD.media_play()
-            icon = "resources/pause.png"
+            await self._run_mpd(self.MPD.media_play)
+            icon = self._pause_icon
         elif self.MPD.state == const.STATE_OFF:
-            self.MPD.turn_on()
-            icon = "resources/pause.png"
-        self.MPD.update()
+            await self._run_mpd(self.MPD.turn_on)
+            icon = self._pause_icon
+        snap = await self._run_mpd(self.MPD.snapshot)
 
-        play_icon = QtGui.QIcon()
-        play_icon.addPixmap(QtGui.QPixmap(icon), QtGui.QIcon.Normal, QtGui.QIcon.Off)
-        self.ui.play_pause_btn.setIcon(play_icon)
+        self.ui.play_pause_btn.setIcon(icon)
+        self._refresh_ui(snap)
 
     def volume_changed(self, vol):
-        self.MPD.set_volume_level(vol / 100)
+        self._last_vol = vol
+        self._spawn(self._run_mpd(self.MPD.set_volume_level, vol / 100))
 
     def select_song(self, current, previous):
         if current:
-            self.MPD.play_media(const.MEDIA_TYPE_MUSIC, current.text())
+            self._spawn(
+                self._run_mpd(self.MPD.play_media, const.MEDIA_TYPE_MUSIC, current.text())
+            )
 
     def select_playlist(self, current, previous):
-        self.ui.songs_widget.clear()
-        songs_in_playlist = []
-        if current and current.text():
-            songs_in_playlist = self.MPD.list_playlist(current.text())
-            self.MPD.play_media(const.MEDIA_TYPE_PLAYLIST, current.text())
-        if songs_in_playlist:
-            self.ui.songs_widget.addItems(songs_in_playlist)
+        name = current.text() if current else None
+        if name == self._current_playlist_name:
+            return
+        self._current_playlist_name = name
+
+        if not name:
+            self._set_songs([])
+            return
+        self._spawn(self._load_playlist(name))
+        self._spawn(self._run_mpd(self.MPD.play_media, const.MEDIA_TYPE_PLAYLIST, name))
+
+    async def _load_playlist(self, name):
+        songs_in_playlist = await self._run_mpd(self.MPD.list_playlist, name)
+        # Drop the result if another playlist was selected meanwhile.
+        if name == self._current_playlist_name:
+            self._set_songs(songs_in_playlist)
+
+    def _set_songs(self, songs):
+        # Only touch the rows that differ from the songs already shown.
+        widget = self.ui.songs_widget
+        widget.setUpdatesEnabled(False)
+        widget.blockSignals(True)
+
+        # The rows now belong to another playlist, so drop the old current
+        # row; otherwise clicking it would not emit currentItemChanged.
+        widget.setCurrentRow(-1)
+        for row, (old, new) in enumerate(zip(self._current_songs, songs)):
+            if old != new:
+                widget.item(row).setText(new)
+        while widget.count() > len(songs):
+            widget.takeItem(widget.count() - 1)
+        if widget.count() < len(songs):
+            widget.addItems(songs[widget.count():])
+        self._current_songs = songs
+
+        widget.blockSignals(False)
+        widget.setUpdatesEnabled(True)
 
 
@@ -1,7 +1,7 @@
 import asyncio
-import threading
+import time
 from functools import wraps
-from datetime import timedelta, datetime
+from datetime import timedelta
 from typing import (Any, Optional, Callable, Union, Coroutine)
 
 
@@ -20,13 +20,15 @@ class Throttle:
     Decorator takes in an optional second timedelta interval to throttle the
     'no_throttle' calls.
 
-    Adds a datetime attribute `last_call` to the method.
+    The time of the last call is tracked with `time.monotonic()`, so the
+    cooldown is not affected by wall clock changes.
     """
 
     def __init__(self, min_time: timedelta,
                  limit_no_throttle: Optional[timedelta] = None) -> None:
         """Initialize the throttle."""
         self.min_time = min_time
+        self._min_time_s = min_time.total_seconds()
         self.limit_no_throttle = limit_no_throttle
 
     def __call__(self, method: Callable) -> Callable:
@@ -61,7 +63,7 @@ class Throttle:
         def wrapper(*args: Any, **kwargs: Any) -> Union[Callable, Coroutine]:
             """Wrap that allows wrapped to be called only once per min_time.
 
-            If we cannot acquire the lock, it is running so return None.
+            If the busy flag is set, it is running so return None.
             """
             # pylint: disable=protected-access
             if hasattr(method, '__self__'):
@@ -75,23 +77,26 @@ class Throttle:
                 host._throttle = {}
 
             if id(self) not in host._throttle:
-                host._throttle[id(self)] = [threading.Lock(), None]
+                host._throttle[id(self)] = [False, None]
             throttle = host._throttle[id(self)]
 
-            if not throttle[0].acquire(False):
+            # The GIL makes this check-and-set safe enough for a
+            # non-blocking reentrancy guard.
+            if throttle[0]:
                 return throttled_value()
+            throttle[0] = True
 
             # Check if method is never called or no_throttle is given
-            force = kwargs.pop('no_throttle', False) or not throttle[1]
+            force = kwargs.pop('no_throttle', False) or throttle[1] is None
 
             try:
-                if force or datetime.now() - throttle[1] > self.min_time:
+                if force or time.monotonic() - throttle[1] > self._min_time_s:
                     result = method(*args, **kwargs)
-                    throttle[1] = datetime.now()
+                    throttle[1] = time.monotonic()
                     return result  # type: ignore
 
                 return throttled_value()
             finally:
-                throttle[0].release()
+                throttle[0] = False
 
         return wrapper
@@ -1,24 +1,22 @@
 from PySide2 import QtWidgets
-from PySide2.QtCore import Signal
+from PySide2.QtCore import Qt
 
 WIDTH = 150
 
 
-class VolumeWidget(QtWidgets.QProgressBar):
-    valueChanged = Signal(int)
-
+class VolumeWidget(QtWidgets.QSlider):
     def __init__(self):
-        super().__init__()
-        self.setTextVisible(False)
+        super().__init__(Qt.Horizontal)
         self.setRange(0, 100)
         self.setValue(100)
         self.setFixedHeight(25)
         self.setMaximumWidth(WIDTH)
-        self.dragging = False
+        # Only emit valueChanged once a drag is released, not for every step.
+        self.setTracking(False)
 
         self.setStyleSheet(
             """
-            QProgressBar {
+            QSlider::groove:horizontal {
                 margin: 10px;
                 height: 5px;
                 border: 0px solid #555;
@@ -26,27 +24,19 @@ class VolumeWidget(QtWidgets.QProgressBar):
                 background-color: #666;
             }
 
-            QProgressBar::chunk {
+            QSlider::sub-page:horizontal {
+                margin: 10px 0px 10px 10px;
+                background-color: white;
+                border-radius: 2px;
+            }
+
+            QSlider::handle:horizontal {
                 background-color: white;
+                width: 5px;
                 border-radius: 2px;
-                width: 1px;
             }
             """
         )
 
     def update_position(self, level):
-        self.setValue(level)
-
-    def mousePressEvent(self, event):
-        self.dragging = True
-        value = int((event.x() / self.width()) * self.maximum())
-        self.setValue(value)
-
-    def mouseMoveEvent(self, event):
-        if self.dragging and 0 <= event.x() <= WIDTH:
-            value = int((event.x() / self.width()) * self.maximum())
-            self.setValue(value)
-            self.valueChanged.emit(value)
-
-    def mouseReleaseEvent(self, event):
-        self.dragging = False
\ No newline at end of file
+        self.setValue(level)
\ No newline at end of file
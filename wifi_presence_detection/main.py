@@ -1,14 +1,17 @@
 from connect_box import ConnectBox
 from connect_box.exceptions import ConnectBoxError, ConnectBoxLoginError
+from nmap import PortScanner, PortScannerError
 from typing import List, Optional
 from collections import namedtuple
-from datetime import timedelta, datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from functools import partial
 from typing import Any
 import aiohttp
 import asyncio
 import json
 import logging
+import time
 
 
 CONF_HOST = "host"
@@ -18,9 +21,11 @@ CONF_EXCLUDE = "exclude"
 CONF_HOME_INTERVAL = "home_interval"
 CONF_OPTIONS = "scan_options"
 
+SCAN_POOL_SIZE = 8
+
 logging.basicConfig(format='%(asctime)-15s %(message)s')
 _LOGGER = logging.getLogger(__name__)
-_LOGGER.setLevel(logging.DEBUG)
+_LOGGER.setLevel(logging.INFO)
 
 Device = namedtuple("Device", ["mac", "name", "ip", "last_update"])
 
@@ -32,11 +37,20 @@ class DeviceScanner:
 
     def __init__(self):
         self._loop = asyncio.get_running_loop()
+        # Keep scanner jobs off the event loop's shared default executor.
+        self._pool = ThreadPoolExecutor(
+            max_workers=SCAN_POOL_SIZE, thread_name_prefix="scan"
+        )
+
+    async def aclose(self):
+        """Shut down the scanner's thread pool."""
+        await self._loop.run_in_executor(None, self._pool.shutdown)
 
     async def async_add_job(self, func, *args, **kwargs):
-        """Run async task."""
+        """Run a blocking function in the executor."""
+        result = None
         try:
-            result = await self._loop.run_in_executor(None, partial(func, *args, **kwargs))
+            result = await self._loop.run_in_executor(self._pool, partial(func, *args, **kwargs))
             _LOGGER.debug("Result from running task: %s", result)
         except Exception as e:
             _LOGGER.error(e)
@@ -57,23 +71,21 @@ class DeviceScanner:
         """Get the name of a device."""
         raise NotImplementedError()
 
-    def async_get_device_name(self, device: str) -> Any:
+    async def async_get_device_name(self, device: str) -> Optional[str]:
         """Get the name of a device.
 
-        This method must be run in the event loop and returns a coroutine.
+        Name lookups only read the results of the last scan, so they are
+        called directly instead of being sent to the executor.
         """
-        return self.async_add_job(self.get_device_name, device)
+        return self.get_device_name(device)
 
     def get_extra_attributes(self, device: str) -> dict:
         """Get the extra attributes of a device."""
         raise NotImplementedError()
 
-    def async_get_extra_attributes(self, device: str) -> Any:
-        """Get the extra attributes of a device.
-
-        This method must be run in the event loop and returns a coroutine.
-        """
-        return self.async_add_job(self.get_extra_attributes, device)
+    async def async_get_extra_attributes(self, device: str) -> dict:
+        """Get the extra attributes of a device."""
+        return self.get_extra_attributes(device)
 
 ###############################################################################################
 
@@ -101,6 +113,7 @@ class UPCDeviceScanner(DeviceScanner):
     def __init__(self, connect_box: ConnectBox):
         """Initialize the scanner."""
         self.connect_box: ConnectBox = connect_box
+        self._mac_to_host = {}
 
     async def async_scan_devices(self) -> List[str]:
         """Scan for new devices and return a list with found device IDs."""
@@ -109,16 +122,14 @@ class UPCDeviceScanner(DeviceScanner):
         except ConnectBoxError:
             return []
 
-        return [device.mac for device in self.connect_box.devices]
+        self._mac_to_host = {
+            device.mac: device.hostname for device in self.connect_box.devices
+        }
+        return list(self._mac_to_host)
 
     async def async_get_device_name(self, device: str) -> Optional[str]:
         """Get the device name (the name of the wireless device not used)."""
-        for connected_device in self.connect_box.devices:
-            if connected_device.mac != device:
-                continue
-            return connected_device.hostname
-
-        return None
+        return self._mac_to_host.get(device)
 
 ###########################################################################################
 
@@ -136,13 +147,19 @@ class NmapDeviceScanner(DeviceScanner):
     def __init__(self, config):
         """Initialize the scanner."""
         super().__init__()
-        self.last_results = []
+        self._devices_by_mac = {}
 
         self.hosts = config[CONF_HOSTS]
         self.exclude = config[CONF_EXCLUDE]
         minutes = config[CONF_HOME_INTERVAL]
         self._options = config[CONF_OPTIONS]
         self.home_interval = timedelta(minutes=minutes)
+        self._hosts_str = " ".join(self.hosts)
+        self._static_exclude = list(self.exclude)
+
+        # PortScanner() runs `nmap -V` to locate the binary, so it is
+        # created once, on the first scan, off the event loop.
+        self._scanner = None
 
         _LOGGER.debug("Scanner initialized")
 
@@ -150,26 +167,29 @@ class NmapDeviceScanner(DeviceScanner):
         """Scan for new devices and return a list with found device IDs."""
         self._update_info()
 
-        _LOGGER.debug("Nmap last results %s", self.last_results)
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Nmap %d results", len(self._devices_by_mac))
 
-        return [device.mac for device in self.last_results]
+        return list(self._devices_by_mac)
+
+    async def async_scan_devices(self) -> List[str]:
+        """Scan for new devices and return a list with found device IDs.
+
+        Only the nmap call blocks, so it is the only part run in the executor.
+        """
+        await self.async_add_job(self._update_info)
+
+        return list(self._devices_by_mac)
 
     def get_device_name(self, device):
         """Return the name of the given device or None if we don't know."""
-        filter_named = [
-            result.name for result in self.last_results if result.mac == device
-        ]
-
-        if filter_named:
-            return filter_named[0]
-        return None
+        result = self._devices_by_mac.get(device)
+        return result.name if result else None
 
     def get_extra_attributes(self, device):
         """Return the IP of the given device."""
-        filter_ip = next(
-            (result.ip for result in self.last_results if result.mac == device), None
-        )
-        return {"ip": filter_ip}
+        result = self._devices_by_mac.get(device)
+        return {"ip": result.ip if result else None}
 
     def _update_info(self):
         """Scan the network for devices.
@@ -178,34 +198,32 @@ class NmapDeviceScanner(DeviceScanner):
         """
         _LOGGER.debug("Scanning...")
 
-        from nmap import PortScanner, PortScannerError
-
-        scanner = PortScanner()
+        if self._scanner is None:
+            self._scanner = PortScanner()
+        scanner = self._scanner
 
         options = self._options
 
         if self.home_interval:
-            boundary = datetime.now() - self.home_interval
-            last_results = [
-                device for device in self.last_results if device.last_update > boundary
-            ]
-            if last_results:
-                exclude_hosts = self.exclude + [device.ip for device in last_results]
-            else:
-                exclude_hosts = self.exclude
+            boundary = time.monotonic() - self.home_interval.total_seconds()
+            devices = {
+                mac: device
+                for mac, device in self._devices_by_mac.items()
+                if device.last_update > boundary
+            }
         else:
-            last_results = []
-            exclude_hosts = self.exclude
+            devices = {}
+        exclude_hosts = self._static_exclude + [device.ip for device in devices.values()]
         if exclude_hosts:
-            options += " --exclude {}".format(",".join(exclude_hosts))
+            options = f"{options} --exclude {','.join(exclude_hosts)}"
 
         try:
-            result = scanner.scan(hosts=" ".join(self.hosts), arguments=options)
+            result = scanner.scan(hosts=self._hosts_str, arguments=options)
         except PortScannerError:
             _LOGGER.error("PortScannerError happened!")
             return False
 
-        now = datetime.now()
+        now = time.monotonic()
         for ipv4, info in result["scan"].items():
             if info["status"]["state"] != "up":
                 continue
@@ -215,9 +233,10 @@ class NmapDeviceScanner(DeviceScanner):
             if mac is None:
                 _LOGGER.info("No MAC address found for %s", ipv4)
                 continue
-            last_results.append(Device(mac.upper(), name, ipv4, now))
+            mac = mac.upper()
+            devices[mac] = Device(mac, name, ipv4, now)
 
-        self.last_results = last_results
+        self._devices_by_mac = devices
 
         _LOGGER.debug("nmap scan successful")
         return True
@@ -231,21 +250,34 @@ async def async_main():
     with open('config.json') as f:
         config = json.load(f)
 
-    async with aiohttp.ClientSession() as session:
-        print("\nRunning UPC device scanner")
-        upc_scanner = await async_get_scanner(config, session)
-        if upc_scanner:
-            found_devices = await upc_scanner.async_scan_devices()
-            for mac in found_devices:
-                print(await upc_scanner.async_get_device_name(mac))
-        else:
-            print("Failed to instantiate UPCScanner!")
-
-    print("\nRunning nmap device scanner")
+    # The nmap scan takes many seconds, so start it first and let the
+    # UPC login and scan run while it is in progress.
     nmap_scanner = get_scanner(config)
-    found_devices = await nmap_scanner.async_scan_devices()
-    for mac in found_devices:
-        print(mac)
+    try:
+        nmap_task = asyncio.create_task(nmap_scanner.async_scan_devices())
+
+        async with aiohttp.ClientSession() as session:
+            upc_scanner = await async_get_scanner(config, session)
+            if upc_scanner:
+                upc_task = asyncio.create_task(upc_scanner.async_scan_devices())
+                upc_devices, nmap_devices = await asyncio.gather(upc_task, nmap_task)
+
+                names = await asyncio.gather(
+                    *(upc_scanner.async_get_device_name(mac) for mac in upc_devices)
+                )
+                print("\nUPC device scanner")
+                print("\n".join(name for name in names if name))
+            else:
+                print("Failed to instantiate UPCScanner!")
+                nmap_devices = await nmap_task
+    finally:
+        await nmap_scanner.aclose()
+
+    names = await asyncio.gather(
+        *(nmap_scanner.async_get_device_name(mac) for mac in nmap_devices)
+    )
+    print("\nnmap device scanner")
+    print("\n".join("{} {}".format(mac, name) for mac, name in zip(nmap_devices, names)))
 
 
 if __name__ == '__main__':
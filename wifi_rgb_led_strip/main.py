@@ -1,6 +1,9 @@
+import asyncio
 import socket
 import random
 import logging
+import flux_led
+from functools import partial
 
 _LOGGER = logging.getLogger(__name__)
 _LOGGER.setLevel(logging.DEBUG)
@@ -64,6 +67,9 @@ MODE_RGBW = "rgbw"
 
 EFFECT_CUSTOM_CODE = 0x60
 
+# Bulbs on the LAN usually answer the discovery broadcast within 2 seconds.
+DEFAULT_SCAN_TIMEOUT = 2
+
 EFFECT_MAP = {
     EFFECT_COLORLOOP: 0x25,
     EFFECT_RED_FADE: 0x26,
@@ -87,32 +93,36 @@ EFFECT_MAP = {
     EFFECT_COLORJUMP: 0x38,
 }
 
+EFFECT_CODE_TO_NAME = {code: effect for effect, code in EFFECT_MAP.items()}
 
-FLUX_EFFECT_LIST = sorted(list(EFFECT_MAP)) + [EFFECT_RANDOM]
 
+FLUX_EFFECT_LIST = tuple(sorted(EFFECT_MAP)) + (EFFECT_RANDOM,)
+FLUX_EFFECT_LIST_WITH_CUSTOM = FLUX_EFFECT_LIST + (EFFECT_CUSTOM,)
 
-def setup_platform():
-    """Set up the Flux lights."""
 
-    import flux_led
+async def async_setup_platform(scan_timeout=DEFAULT_SCAN_TIMEOUT):
+    """Set up the Flux lights found on the LAN within scan_timeout seconds."""
 
     lights = []
     light_ips = []
 
     # Find the bulbs on the LAN
     scanner = flux_led.BulbScanner()
-    scanner.scan(timeout=10)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, scanner.scan, scan_timeout)
     for device in scanner.getBulbInfo():
         ipaddr = device["ipaddr"]
         if ipaddr in light_ips:
             continue
+        light_ips.append(ipaddr)
         device["name"] = "{} {}".format(device["id"], ipaddr)
         device[ATTR_MODE] = None
         device[CONF_PROTOCOL] = None
         device[CONF_CUSTOM_EFFECT] = None
         dlight = FluxLight(device)
         lights.append(dlight)
-        return dlight
+
+    return lights
 
 
 class FluxLight:
@@ -128,8 +138,6 @@ class FluxLight:
 
     def _connect(self):
         """Connect to Flux light."""
-        import flux_led
-
         self._bulb = flux_led.WifiLedBulb(self._ipaddr, timeout=5)
         if self._protocol:
             self._bulb.setProtocol(self._protocol)
@@ -189,7 +197,7 @@ class FluxLight:
     def effect_list(self):
         """Return the list of supported effects."""
         if self._custom_effect:
-            return FLUX_EFFECT_LIST + [EFFECT_CUSTOM]
+            return FLUX_EFFECT_LIST_WITH_CUSTOM
 
         return FLUX_EFFECT_LIST
 
@@ -201,11 +209,7 @@ class FluxLight:
         if current_mode == EFFECT_CUSTOM_CODE:
             return EFFECT_CUSTOM
 
-        for effect, code in EFFECT_MAP.items():
-            if current_mode == code:
-                return effect
-
-        return None
+        return EFFECT_CODE_TO_NAME.get(current_mode)
 
     def turn_on(self, **kwargs):
         """Turn the specified or all lights on."""
@@ -277,11 +281,18 @@ class FluxLight:
         """Turn the specified or all lights off."""
         self._bulb.turnOff()
 
-    def update(self):
+    async def async_turn_on(self, **kwargs):
+        """Turn the light on without blocking the event loop."""
+        await asyncio.get_running_loop().run_in_executor(
+            None, partial(self.turn_on, **kwargs)
+        )
+
+    async def async_update(self):
         """Synchronize state with bulb."""
+        loop = asyncio.get_running_loop()
         if not self.available:
             try:
-                self._connect()
+                await loop.run_in_executor(None, self._connect)
                 self._error_reported = False
             except socket.error:
                 self._disconnect()
@@ -292,13 +303,17 @@ class FluxLight:
                     self._error_reported = True
                 return
 
-        self._bulb.update_state(retry=2)
+        await loop.run_in_executor(None, self._bulb.update_state, 2)
+
+
+async def main():
+    for light in await async_setup_platform():
+        await light.async_update()
+        # light.turn_on(rgb=(0, 0, 100))  # r b g
+        # light.turn_on(brightness=20)
+        await light.async_turn_on(effect=EFFECT_COLORLOOP)
+        # light.turn_off()
 
 
 if __name__ == "__main__":
-    light = setup_platform()
-    light.update()
-    # light.turn_on(rgb=(0, 0, 100))  # r b g
-    # light.turn_on(brightness=20)
-    light.turn_on(effect=EFFECT_COLORLOOP)
-    # light.turn_off()
+    asyncio.run(main())
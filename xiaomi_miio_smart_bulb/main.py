@@ -1,11 +1,13 @@
-from miio import PhilipsBulb
+from miio import PhilipsBulb, DeviceException
+from concurrent.futures import ThreadPoolExecutor
 import json
 import logging
 from datetime import timedelta
-from functools import partial
-from math import ceil
+from functools import lru_cache
+from typing import Optional
 import asyncio
 import datetime
+import time
 
 
 SUCCESS = ["ok"]
@@ -22,10 +24,35 @@ ATTR_DELAYED_TURN_OFF = "delayed_turn_off"
 ATTR_SCENE = "scene"
 DELAYED_TURN_OFF_MAX_DEVIATION_SECONDS = 4
 
+# Turn on requests arriving within this window are merged into one RPC.
+TURN_ON_DEBOUNCE_SECONDS = 0.03
+
 
-logging.basicConfig(format='%(asctime)-15s %(message)s')
 _LOGGER = logging.getLogger(__name__)
-_LOGGER.setLevel(logging.DEBUG)
+
+
+def _delayed_turn_off_timestamp(
+    countdown: int, current_epoch: int, previous_epoch: Optional[int]
+):
+    """Update the turn off timestamp (epoch seconds) only if necessary.
+
+    Only called for a running countdown, i.e. countdown > 0.
+    """
+    new = current_epoch + countdown
+
+    if previous_epoch is None:
+        return new
+
+    if abs(previous_epoch - new) < DELAYED_TURN_OFF_MAX_DEVIATION_SECONDS:
+        return previous_epoch
+
+    return new
+
+
+@lru_cache(maxsize=1024)
+def _translate(value, left_min, left_max, right_min, right_max):
+    """Map a value from left span to right span."""
+    return right_min + (value - left_min) * (right_max - right_min) // (left_max - left_min)
 
 
 class XiaomiPhilipsBulb:
@@ -45,46 +72,170 @@ class XiaomiPhilipsBulb:
         self._color_temp = None
         self._state_attrs = {ATTR_SCENE: None, ATTR_DELAYED_TURN_OFF: None, ATTR_MODEL: self._model}
 
-        self._loop = asyncio.get_running_loop()
+        # Bound miio methods used to issue RPCs.
+        self._set_bri_cct = light.set_brightness_and_color_temperature
+        self._set_cct = light.set_color_temperature
+        self._set_bri = light.set_brightness
+        self._on = light.on
+        self._off = light.off
+        self._status = light.status
+        self._delay_off = light.delay_off
+
+        # Commands waiting for the flush task, as (coroutine function, kwargs).
+        self._pending = []
+        self._flush_task = None
+        self._update_task = None
+
+        # The miio device keeps a handshake and message id counter that are
+        # not thread safe, so every call for this bulb runs on one thread.
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="miio-{}".format(name)
+        )
 
-    async def _try_command(self, mask_error, func, *args, **kwargs):
-        """Call a light command handling error messages."""
-        from miio import DeviceException
+    @property
+    def name(self):
+        """Return the name of the device if any."""
+        return self._name
+
+    @property
+    def min_mireds(self):
+        """Return the coldest color_temp that this light supports."""
+        return 175
+
+    @property
+    def max_mireds(self):
+        """Return the warmest color_temp that this light supports."""
+        return 333
+
+    @property
+    def device_state_attributes(self):
+        """Return the state attributes of the device."""
+        attrs = dict(self._state_attrs)
+        if attrs[ATTR_DELAYED_TURN_OFF] is not None:
+            attrs[ATTR_DELAYED_TURN_OFF] = datetime.datetime.fromtimestamp(
+                attrs[ATTR_DELAYED_TURN_OFF], datetime.timezone.utc
+            )
+        return attrs
+
+    async def async_close(self):
+        """Shut down the bulb's worker thread."""
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+
+    def _run(self, func, *args):
+        """Run a blocking miio call on this bulb's worker thread."""
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
 
+    async def _try_command(self, mask_error, func, *args):
+        """Call a light command handling error messages."""
         try:
-            result = await self._loop.run_in_executor(None, partial(func, *args, **kwargs))
-            _LOGGER.debug("Response received from light: %s", result)
+            result = await self._run(func, *args)
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("Response received from light: %s", result)
             return result == SUCCESS
         except DeviceException as exc:
             _LOGGER.error(mask_error, exc)
             self._available = False
             return False
 
-    async def async_turn_on(self, **kwargs):
-        """Turn the light on."""
-        if ATTR_COLOR_TEMP in kwargs:
-            color_temp = kwargs[ATTR_COLOR_TEMP]
-            percent_color_temp = self.translate(
-                color_temp, self.max_mireds, self.min_mireds, CCT_MIN, CCT_MAX
-            )
+    async def _try_command_and_update(self, mask_error, func, *args):
+        """Call a light command and fetch the new state in one executor job."""
+        def command_and_status():
+            result = func(*args)
+            # A failed status poll must not be reported as a failed command.
+            try:
+                return result, self._status(), None
+            except DeviceException as exc:
+                return result, None, exc
 
-        if ATTR_BRIGHTNESS in kwargs:
-            brightness = kwargs[ATTR_BRIGHTNESS]
-            percent_brightness = ceil(100 * brightness / 255.0)
+        try:
+            result, state, status_error = await self._run(command_and_status)
+        except DeviceException as exc:
+            _LOGGER.error(mask_error, exc)
+            self._available = False
+            return False
 
-        if ATTR_BRIGHTNESS in kwargs and ATTR_COLOR_TEMP in kwargs:
-            _LOGGER.debug(
-                "Setting brightness and color temperature: "
-                "%s %s%%, %s mireds, %s%% cct",
-                brightness,
-                percent_brightness,
-                color_temp,
-                percent_color_temp,
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Response received from light: %s", result)
+        if status_error is None:
+            self._handle_state(state)
+        else:
+            _LOGGER.error("Got exception while fetching the state: %s", status_error)
+        return result == SUCCESS
+
+    async def async_turn_on(self, **kwargs):
+        """Turn the light on.
+
+        Calls made while a previous one is still waiting to be sent are
+        merged into it, so e.g. brightness and color_temp updates fired
+        back to back end up in a single command.
+        """
+        pending = self._pending
+        if pending and pending[-1][0] == self._async_turn_on:
+            pending[-1][1].update(kwargs)
+        else:
+            pending.append((self._async_turn_on, kwargs))
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush_pending())
+        # Shield the shared task so cancelling one caller does not drop the
+        # request for the others.
+        await asyncio.shield(self._flush_task)
+
+    async def _send_in_order(self, command, **kwargs):
+        """Send a command, queued behind any turn on request not sent yet."""
+        if self._flush_task is None:
+            await command(**kwargs)
+            return
+        self._pending.append((command, kwargs))
+        await asyncio.shield(self._flush_task)
+
+    async def _flush_pending(self):
+        """Send the queued commands in order after the debounce window."""
+        try:
+            await asyncio.sleep(TURN_ON_DEBOUNCE_SECONDS)
+            while self._pending:
+                command, kwargs = self._pending.pop(0)
+                await command(**kwargs)
+        finally:
+            self._pending = []
+            self._flush_task = None
+
+    async def _async_turn_on(self, **kwargs):
+        """Send a turn on request to the light."""
+        has_cct = ATTR_COLOR_TEMP in kwargs
+        has_bri = ATTR_BRIGHTNESS in kwargs
+        color_temp = kwargs.get(ATTR_COLOR_TEMP)
+        brightness = kwargs.get(ATTR_BRIGHTNESS)
+
+        if has_cct:
+            percent_color_temp = _translate(
+                color_temp, self.max_mireds, self.min_mireds, CCT_MIN, CCT_MAX
             )
 
-            result = await self._try_command(
+        if has_bri:
+            percent_brightness = (100 * brightness + 254) // 255
+
+        if has_bri and has_cct:
+            # Skip the round-trip if the light already is in this state.
+            if (
+                self._state
+                and brightness == self._brightness
+                and color_temp == self._color_temp
+            ):
+                return
+
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug(
+                    "Setting brightness and color temperature: "
+                    "%s %s%%, %s mireds, %s%% cct",
+                    brightness,
+                    percent_brightness,
+                    color_temp,
+                    percent_color_temp,
+                )
+
+            result = await self._try_command_and_update(
                 "Setting brightness and color temperature failed: " "%s bri, %s cct",
-                self._light.set_brightness_and_color_temperature,
+                self._set_bri_cct,
                 percent_brightness,
                 percent_color_temp,
             )
@@ -93,28 +244,36 @@ class XiaomiPhilipsBulb:
                 self._color_temp = color_temp
                 self._brightness = brightness
 
-        elif ATTR_COLOR_TEMP in kwargs:
-            _LOGGER.debug(
-                "Setting color temperature: " "%s mireds, %s%% cct",
-                color_temp,
-                percent_color_temp,
-            )
+        elif has_cct:
+            if self._state and color_temp == self._color_temp:
+                return
 
-            result = await self._try_command(
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug(
+                    "Setting color temperature: " "%s mireds, %s%% cct",
+                    color_temp,
+                    percent_color_temp,
+                )
+
+            result = await self._try_command_and_update(
                 "Setting color temperature failed: %s cct",
-                self._light.set_color_temperature,
+                self._set_cct,
                 percent_color_temp,
             )
 
             if result:
                 self._color_temp = color_temp
 
-        elif ATTR_BRIGHTNESS in kwargs:
-            _LOGGER.debug("Setting brightness: %s %s%%", brightness, percent_brightness)
+        elif has_bri:
+            if self._state and brightness == self._brightness:
+                return
+
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("Setting brightness: %s %s%%", brightness, percent_brightness)
 
-            result = await self._try_command(
+            result = await self._try_command_and_update(
                 "Setting brightness failed: %s",
-                self._light.set_brightness,
+                self._set_bri,
                 percent_brightness,
             )
 
@@ -122,92 +281,109 @@ class XiaomiPhilipsBulb:
                 self._brightness = brightness
 
         else:
-            await self._try_command("Turning the light on failed.", self._light.on)
+            await self._try_command_and_update(
+                "Turning the light on failed.", self._on
+            )
 
     async def async_turn_off(self):
         """Turn the light off."""
-        await self._try_command("Turning the light off failed.", self._light.off)
+        await self._send_in_order(self._async_turn_off)
+
+    async def _async_turn_off(self):
+        """Send a turn off request to the light."""
+        await self._try_command_and_update(
+            "Turning the light off failed.", self._off
+        )
 
     async def async_update(self):
-        """Fetch state from the device."""
-        from miio import DeviceException
+        """Fetch state from the device.
 
+        Callers arriving while a poll is in flight wait for that poll
+        instead of issuing a second status() call.
+        """
+        if self._update_task is None or self._update_task.done():
+            self._update_task = asyncio.ensure_future(self._async_update())
+        await asyncio.shield(self._update_task)
+
+    async def _async_update(self):
+        """Poll the light for its state."""
         try:
-            state = await self._loop.run_in_executor(None, self._light.status)
+            state = await self._run(self._status)
         except DeviceException as ex:
             self._available = False
             _LOGGER.error("Got exception while fetching the state: %s", ex)
             return
 
-        _LOGGER.debug("Got new state: %s", state)
+        self._handle_state(state)
+
+    def _handle_state(self, state):
+        """Store the state reported by the light."""
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Got new state: %s", state)
         self._available = True
         self._state = state.is_on
-        self._brightness = ceil((255 / 100.0) * state.brightness)
-        self._color_temp = self.translate(
+        self._brightness = (255 * state.brightness + 99) // 100
+        self._color_temp = _translate(
             state.color_temperature, CCT_MIN, CCT_MAX, self.max_mireds, self.min_mireds
         )
 
-        delayed_turn_off = self.delayed_turn_off_timestamp(
-            state.delay_off_countdown,
-            datetime.datetime.utcnow(),
-            self._state_attrs[ATTR_DELAYED_TURN_OFF],
-        )
+        countdown = state.delay_off_countdown
+        if countdown:
+            delayed_turn_off = _delayed_turn_off_timestamp(
+                countdown, int(time.time()), self._state_attrs[ATTR_DELAYED_TURN_OFF]
+            )
+        else:
+            delayed_turn_off = None
 
-        self._state_attrs.update(
-            {ATTR_SCENE: state.scene, ATTR_DELAYED_TURN_OFF: delayed_turn_off}
-        )
+        self._state_attrs[ATTR_SCENE] = state.scene
+        self._state_attrs[ATTR_DELAYED_TURN_OFF] = delayed_turn_off
 
     async def async_set_delayed_turn_off(self, time_period: timedelta):
         """Set delayed turn off."""
+        await self._send_in_order(
+            self._async_set_delayed_turn_off, time_period=time_period
+        )
+
+    async def _async_set_delayed_turn_off(self, time_period: timedelta):
+        """Send a delayed turn off request to the light."""
         await self._try_command(
             "Setting the turn off delay failed.",
-            self._light.delay_off,
+            self._delay_off,
             time_period.total_seconds(),
         )
 
-    @staticmethod
-    def delayed_turn_off_timestamp(
-        countdown: int, current: datetime, previous: datetime
-    ):
-        """Update the turn off timestamp only if necessary."""
-        if countdown is not None and countdown > 0:
-            new = current.replace(microsecond=0) + timedelta(seconds=countdown)
-
-            if previous is None:
-                return new
-
-            lower = timedelta(seconds=-DELAYED_TURN_OFF_MAX_DEVIATION_SECONDS)
-            upper = timedelta(seconds=DELAYED_TURN_OFF_MAX_DEVIATION_SECONDS)
-            diff = previous - new
-            if lower < diff < upper:
-                return previous
-
-            return new
 
-        return None
-
-    @staticmethod
-    def translate(value, left_min, left_max, right_min, right_max):
-        """Map a value from left span to right span."""
-        left_span = left_max - left_min
-        right_span = right_max - right_min
-        value_scaled = float(value - left_min) / float(left_span)
-        return int(right_min + (value_scaled * right_span))
+def _load_config(path):
+    with open(path) as file:
+        return json.load(file)
 
 
 async def main():
-    with open("config.json") as file:
-        config = json.load(file)
-    light = PhilipsBulb(config["host"], config["token"])
-    device = XiaomiPhilipsBulb(config["name"], light, config["model"], None)
+    config = await asyncio.to_thread(_load_config, "config.json")
+    devices = [
+        XiaomiPhilipsBulb(
+            entry["name"], PhilipsBulb(entry["host"], entry["token"]), entry["model"], None
+        )
+        for entry in config.get("devices", [config])
+    ]
 
-    await asyncio.gather(device.async_update())
-    # await asyncio.gather(device.async_turn_off())
-    # await asyncio.gather(device.async_turn_on())
-    # await asyncio.gather(device.async_turn_on(color_temp=333)) #  175  333
-    # await asyncio.gather(device.async_turn_on(brightness=190)) # 1 255
-    # await asyncio.gather(device.async_set_delayed_turn_off(timedelta(seconds=10)))
+    try:
+        results = await asyncio.gather(
+            *(device.async_update() for device in devices), return_exceptions=True
+        )
+        for device, result in zip(devices, results):
+            if isinstance(result, Exception):
+                _LOGGER.error("Updating %s failed: %s", device.name, result)
+        # await devices[0].async_turn_off()
+        # await devices[0].async_turn_on()
+        # await devices[0].async_turn_on(color_temp=333) #  175  333
+        # await devices[0].async_turn_on(brightness=190) # 1 255
+        # await devices[0].async_set_delayed_turn_off(timedelta(seconds=10))
+    finally:
+        await asyncio.gather(*(device.async_close() for device in devices))
 
 
 if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)-15s %(message)s')
+    _LOGGER.setLevel(logging.DEBUG)
     asyncio.run(main())